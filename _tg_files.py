@@ -0,0 +1,185 @@
+"""
+Shared body of the api/stream.py and api/download.py serverless functions
+Both serve a storage-channel document by message id with range support; only the
+content type and Content-Disposition differ. Clients and the stream wrapper come
+from _tg_stream, the same ones index.py uses.
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from telethon.client.downloads import MAX_CHUNK_SIZE
+from telethon.utils import get_input_location
+from telethon.tl.types import DocumentAttributeFilename
+from contextlib import asynccontextmanager
+import orjson
+import logging
+import time
+
+from config import API_ID, API_HASH, BIN_CHANNEL
+from _utils import parse_range, content_disposition, MAX_MSG_ID
+from _tg_stream import (
+    _SESSION, json_body, get_client, acquire_stream_client, release_stream_client, get_bin_peer,
+    disconnect_clients,
+    TelegramStreamWrapper, TelegramStreamingResponse,
+)
+
+log = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect once per instance; every request reuses the client (get_client only logs a
+    failed connect, so the function still boots and requests retry it)"""
+    if API_ID and API_HASH and _SESSION is not None:
+        await get_client()
+    yield
+    await disconnect_clients()
+
+
+# Configuration errors are constant for the life of the instance: serialize them once
+NO_API_JSON = orjson.dumps({
+    "error": "Configuration Error",
+    "details": "API_ID or API_HASH not set in environment variables",
+    "api_id_set": bool(API_ID),
+    "api_hash_set": bool(API_HASH)
+})
+NO_SESSION_JSON = orjson.dumps({
+    "error": "Configuration Error",
+    "details": "SESSION_STRING not set (or not valid) in environment variables",
+    "hint": "Add SESSION_STRING to Vercel environment variables"
+})
+
+
+# Seeking fires many range requests for one file; look each message up only once
+MSG_TTL = 600  # seconds
+MSG_CACHE_SIZE = 4096
+_MSG_CACHE = {}  # msg_id -> (expires_at, (msg, (dc_id, input_location)))
+
+
+async def get_document_message(client, msg_id):
+    """(msg, (dc_id, InputDocumentFileLocation)) from the storage channel; location is None
+    without a document. Documents are cached, location included, so seeks reuse both"""
+    # Out of int32 range Telethon would fail packing the request: it's just not found
+    if not 0 < msg_id <= MAX_MSG_ID:
+        return None, None
+    now = time.monotonic()
+    hit = _MSG_CACHE.get(msg_id)
+    if hit and hit[0] > now:
+        return hit[1]
+    msg = await client.get_messages(await get_bin_peer(client), ids=msg_id)
+    if not msg or not msg.document:
+        return msg, None
+    entry = (msg, get_input_location(msg.document))
+    if len(_MSG_CACHE) >= MSG_CACHE_SIZE:
+        del _MSG_CACHE[next(iter(_MSG_CACHE))]
+    _MSG_CACHE[msg_id] = (now + MSG_TTL, entry)
+    return entry
+
+
+# Largest request Telethon makes (it clamps anything bigger, so 1 MiB would still
+# be sent as 512 KiB); ranges are fetched from multiples of it
+CHUNK_SIZE = MAX_CHUNK_SIZE
+
+
+def get_filename(msg):
+    """Extract filename from message (first non-empty one, like index.doc_filename)"""
+    doc = msg.document
+    return next((a.file_name for a in doc.attributes
+                 if isinstance(a, DocumentAttributeFilename) and a.file_name), f"file_{doc.id}")
+
+
+async def serve_file(request: Request, msg_id: int, media_type: str, attachment: bool = False):
+    """Range-aware response for a storage-channel document; attachment=True adds its file name"""
+    
+    # Debug: Check environment variables
+    if not API_ID or not API_HASH:
+        return json_body(NO_API_JSON, status_code=500)
+    
+    if _SESSION is None:
+        return json_body(NO_SESSION_JSON, status_code=500)
+    
+    try:
+        client = await get_client()
+        
+        # Get message from storage channel
+        msg, location = await get_document_message(client, msg_id)
+        
+        if not msg:
+            return json_body(orjson.dumps({
+                "error": "Message Not Found",
+                "details": f"Message ID {msg_id} not found in channel {BIN_CHANNEL}",
+                "hint": "Make sure the file was uploaded through the bot first"
+            }), status_code=404)
+        
+        if not msg.document:
+            return json_body(orjson.dumps({
+                "error": "Not a Document",
+                "details": f"Message ID {msg_id} exists but has no document attached",
+                "message_type": str(type(msg.media))
+            }), status_code=404)
+        
+        # File info
+        size = msg.document.size
+        
+        # Parse range header for partial content support
+        range_header = request.headers.get('range', '')
+        start = 0
+        end = size - 1
+        partial = False
+        
+        if range_header:
+            rng = parse_range(range_header, size)
+            if rng is None:
+                return Response(status_code=416, headers={'Content-Range': f'bytes */{size}'})
+            start, end, partial = rng
+        
+        length = end - start + 1
+        
+        # Response headers
+        headers = {
+            'Content-Type': media_type,
+            'Content-Length': str(length),
+            'Accept-Ranges': 'bytes',
+        }
+        if attachment:
+            headers['Content-Disposition'] = content_disposition(get_filename(msg))
+        
+        if partial:
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            status_code = 206  # Partial Content
+        else:
+            status_code = 200
+        
+        # Unaligned offsets make Telethon re-fetch part of every request, so start
+        # at a chunk boundary; limit is a number of chunks, not bytes
+        skip = start % CHUNK_SIZE
+        dc_id, file_location = location
+        # Acquired last: from here on the wrapper (or the except below) owns the client
+        stream_client = await acquire_stream_client()
+        try:
+            download_iterator = stream_client.iter_download(
+                file_location,
+                dc_id=dc_id,
+                file_size=size,
+                offset=start - skip,
+                limit=(length + skip + CHUNK_SIZE - 1) // CHUNK_SIZE,
+                chunk_size=CHUNK_SIZE,
+                request_size=CHUNK_SIZE
+            )
+        except BaseException:
+            release_stream_client(stream_client)
+            raise
+        
+        stream_wrapper = TelegramStreamWrapper(stream_client, download_iterator, length, skip)
+        
+        return TelegramStreamingResponse(
+            stream_wrapper,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type
+        )
+    
+    except Exception as e:
+        # Traceback goes to the function logs only; clients just get the exception type
+        log.exception("file %s failure", msg_id)
+        return json_body(orjson.dumps({"error": "Internal Server Error", "exception_type": type(e).__name__}), status_code=500)
@@ -0,0 +1,240 @@
+"""
+MTProto clients and the chunk streaming wrapper shared by index.py and the api functions
+One parsed session, a lazily grown pool of transfer clients, the storage channel peer
+and the prefetching body iterator, so every route closes downloads the same way.
+"""
+
+from fastapi.responses import Response, StreamingResponse
+from telethon import TelegramClient
+from telethon.sessions import StringSession
+from telethon.client.downloads import MAX_CHUNK_SIZE
+from collections import OrderedDict
+import asyncio
+import logging
+import os
+
+from config import API_ID, API_HASH, BIN_CHANNEL, SESSION_STRING
+from _utils import safe_int
+
+log = logging.getLogger("tfs")
+
+CHUNK_TIMEOUT = 30  # seconds to wait for a single chunk from Telegram
+PREFETCH_DEPTH = 4  # chunks fetched ahead of a slow client
+COALESCE_LIMIT = 1024 * 1024  # most bytes handed to the server in one send
+
+# Every player opens a file at byte 0 (probe, then headers/moov), so the first bytes of
+# recently played files stay in memory. One full request: a multiple of every chunk
+# size, so reads after the cached part stay aligned.
+PREROLL_SIZE = MAX_CHUNK_SIZE
+PREROLL_CACHE_BYTES = 64 * 1024 * 1024
+_PREROLL_CACHE = OrderedDict()  # encoded_id -> first PREROLL_SIZE bytes, in LRU order
+_preroll_bytes = 0
+
+def store_preroll(key, data):
+    global _preroll_bytes
+    if key in _PREROLL_CACHE:
+        return
+    _PREROLL_CACHE[key] = data
+    _preroll_bytes += len(data)
+    while _preroll_bytes > PREROLL_CACHE_BYTES:
+        _, old = _PREROLL_CACHE.popitem(last=False)
+        _preroll_bytes -= len(old)
+
+# SESSION_STRING is base64 + struct + AuthKey hashing: parse it once per instance
+try:
+    _SESSION = StringSession(SESSION_STRING) if SESSION_STRING else None
+except Exception as e:
+    log.error("❌ Invalid SESSION_STRING: %s", e)
+    _SESSION = None
+
+def copy_session():
+    """Fresh StringSession with the parsed DC and auth key, for clients that must not share state"""
+    session = StringSession()
+    if _SESSION is not None:
+        session.set_dc(_SESSION.dc_id, _SESSION.server_address, _SESSION.port)
+        session.auth_key = _SESSION.auth_key
+    return session
+
+# Global Client for Reuse (Helps with Vercel warm starts)
+GLOBAL_CLIENT = None
+_CLIENT_LOCK = asyncio.Lock()
+
+async def get_client():
+    """Shared MTProto client; concurrent cold requests wait for a single handshake"""
+    global GLOBAL_CLIENT
+    if GLOBAL_CLIENT is not None and GLOBAL_CLIENT.is_connected():
+        return GLOBAL_CLIENT
+    async with _CLIENT_LOCK:
+        if GLOBAL_CLIENT is not None and GLOBAL_CLIENT.is_connected():
+            return GLOBAL_CLIENT
+        try:
+            if GLOBAL_CLIENT is None:
+                GLOBAL_CLIENT = TelegramClient(_SESSION or StringSession(), API_ID, API_HASH)
+            # Dropped connections reuse the same client (and its auth key)
+            await GLOBAL_CLIENT.connect()
+        except Exception as e:
+            log.warning("⚠️ Initial Connect Failed: %s", e)
+    return GLOBAL_CLIENT
+
+# One MTProto connection serializes every getFile, so concurrent viewers would queue
+# behind each other. Transfers spread over GLOBAL_CLIENT plus extra sessions on the
+# same auth key, each opened only once every existing client is busy.
+STREAM_POOL_SIZE = max(1, safe_int(os.getenv("STREAM_POOL_SIZE"), 4))
+STREAM_POOL = []  # extra transfer clients beyond GLOBAL_CLIENT
+_IN_FLIGHT = {}  # client -> streams currently using it
+_POOL_LOCK = asyncio.Lock()
+
+def _least_busy():
+    return min((GLOBAL_CLIENT, *STREAM_POOL), key=lambda c: _IN_FLIGHT.get(c, 0))
+
+async def acquire_stream_client():
+    """Least-busy client for one file transfer; pair with release_stream_client"""
+    await get_client()
+    client = _least_busy()
+    if _IN_FLIGHT.get(client) and len(STREAM_POOL) + 1 < STREAM_POOL_SIZE and _SESSION is not None:
+        async with _POOL_LOCK:
+            client = _least_busy()
+            if _IN_FLIGHT.get(client) and len(STREAM_POOL) + 1 < STREAM_POOL_SIZE:
+                extra = TelegramClient(copy_session(), API_ID, API_HASH)
+                try:
+                    await extra.connect()
+                    STREAM_POOL.append(extra)
+                    client = extra
+                except Exception as e:
+                    log.warning("⚠️ Pool Connect Failed: %s", e)
+    if not client.is_connected():
+        await client.connect()
+    _IN_FLIGHT[client] = _IN_FLIGHT.get(client, 0) + 1
+    return client
+
+def release_stream_client(client):
+    _IN_FLIGHT[client] -= 1
+
+# Storage channel as an InputPeerChannel, so get_messages skips the entity lookup
+BIN_PEER = None
+
+async def get_bin_peer(client):
+    """BIN_CHANNEL resolved once per instance; valid on every pool client (same account)"""
+    global BIN_PEER
+    if BIN_PEER is None:
+        BIN_PEER = await client.get_input_entity(BIN_CHANNEL)
+    return BIN_PEER
+
+async def close_download(iterator):
+    """Hand an iter_download's DC sender back. One that never started (client gone before
+    the first byte, cancelled inside _init) has no _sender yet, and close() would raise."""
+    if getattr(iterator, "_sender", None) is None:
+        return
+    try:
+        await iterator.close()
+    except Exception as e:
+        log.warning("⚠️ Download close failed: %r", e)
+
+def json_body(body: bytes, **kwargs) -> Response:
+    """Response for a body already serialized with orjson"""
+    return Response(content=body, media_type="application/json", **kwargs)
+
+async def disconnect_clients():
+    """Close every MTProto connection of this instance (lifespan shutdown)"""
+    for client in (GLOBAL_CLIENT, *STREAM_POOL):
+        if client is not None and client.is_connected():
+            await client.disconnect()
+
+class TelegramStreamWrapper:
+    """Helper to stream Telegram chunks to FastAPI response"""
+    def __init__(self, client, iterator, length=None, skip=0,
+                 depth=PREFETCH_DEPTH, coalesce=COALESCE_LIMIT, head=b"", capture_key=None, capture_len=0):
+        # Transfer client from acquire_stream_client, handed back on close
+        self.client = client
+        self.iterator = iterator
+        # iter_download works in whole chunks, so trim the body to the exact byte count
+        self.length = length
+        # Lead-in bytes of the first (aligned) chunk that precede the requested range
+        self.skip = skip
+        self.depth = depth
+        self.coalesce = coalesce
+        # Cached bytes sent ahead of the iterator's data
+        self.head = head
+        # Preroll cache key to fill from the raw data, when the iterator starts at byte 0
+        self.capture_key = capture_key
+        self.capture_len = capture_len
+        self._producer = None
+        self._closed = False
+
+    async def aclose(self):
+        """Stop prefetching and hand Telethon's DC sender and the pool client back; safe to call twice"""
+        if self._closed:
+            return
+        self._closed = True
+        release_stream_client(self.client)
+        if self._producer is not None:
+            self._producer.cancel()
+            # It may still be inside iter_download's __anext__: let it unwind before
+            # close() hands the borrowed sender back (wait() doesn't re-raise its cancel)
+            await asyncio.wait([self._producer])
+        # iter_download only returns a borrowed sender by itself when it reads to EOF
+        await close_download(self.iterator)
+
+    async def _produce(self, queue):
+        """Pull chunks from Telegram while earlier ones are still being sent"""
+        try:
+            async for chunk in self.iterator:
+                await queue.put(chunk)
+        except Exception as e:
+            log.warning("📡 Stream Interrupted: %r", e)
+        await queue.put(None)
+
+    async def __aiter__(self):
+        remaining = self.length
+        skip = self.skip
+        captured = bytearray() if self.capture_key is not None else None
+        queue = asyncio.Queue(self.depth)
+        self._producer = asyncio.ensure_future(self._produce(queue))
+        try:
+            if self.head:
+                yield self.head
+            done = False
+            while not done:
+                chunk = await asyncio.wait_for(queue.get(), timeout=CHUNK_TIMEOUT)
+                if chunk is None:
+                    break
+                # Chunks that arrived while the client was busy go out in one send
+                parts, size = [chunk], len(chunk)
+                while size < self.coalesce and not queue.empty():
+                    chunk = queue.get_nowait()
+                    if chunk is None:
+                        done = True
+                        break
+                    parts.append(chunk)
+                    size += len(chunk)
+                # Trimming below slices a view instead of copying up to a chunk per request
+                data = memoryview(parts[0] if len(parts) == 1 else b"".join(parts))
+                if captured is not None:
+                    captured += data
+                    if len(captured) >= self.capture_len:
+                        store_preroll(self.capture_key, bytes(captured[:self.capture_len]))
+                        captured = None
+                if skip:
+                    data = data[skip:]
+                    skip = 0
+                if remaining is not None and len(data) >= remaining:
+                    yield data[:remaining]
+                    break
+                if remaining is not None:
+                    remaining -= len(data)
+                yield data
+        except Exception as e:
+            log.warning("📡 Stream Interrupted: %r", e)
+        finally:
+            # The client itself stays up: pool clients are shared by every request
+            await self.aclose()
+
+
+class TelegramStreamingResponse(StreamingResponse):
+    """Closes the Telegram stream however the response ends (done, disconnect or
+    cancellation) instead of leaving it to async-generator finalization"""
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await asyncio.shield(self.body_iterator.aclose())
@@ -0,0 +1,116 @@
+"""
+Hot-path helpers shared by the API (ID codec, size formatting, clock)
+Fully annotated and free of app imports so `mypyc _utils.py` can build a
+compiled extension; Python loads that .so ahead of this file when present.
+"""
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Final, Optional, Tuple
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def safe_int(val: object, default: int = 0) -> int:
+    """Safe int conversion for env values"""
+    try:
+        if not val:
+            return default
+        return int(str(val).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+SECRET_KEY: Final = safe_int(os.getenv("SECRET_KEY"), 742658931)
+
+
+def get_now() -> int:
+    return int(time.time())
+
+
+@lru_cache(maxsize=4096)
+def encode_id(msg_id: int) -> str:
+    """Encode message ID using XOR for obfuscation"""
+    return format(msg_id ^ SECRET_KEY, 'x')
+
+
+class InvalidID(ValueError):
+    """Encoded ID that is not valid hex"""
+
+
+# Plain hex digits only: int(..., 16) would also take "0x", "_", signs and whitespace,
+# letting many spellings of one id fill the cache below
+_HEX_RE: Final = re.compile(r"[0-9a-fA-F]+")
+# Message ids are positive int32s; anything else fails in Telethon's struct packing
+MAX_MSG_ID: Final = 2**31 - 1
+
+
+# Landing pages and players re-request the same IDs constantly
+@lru_cache(maxsize=8192)
+def decode_id(encoded_id: str) -> int:
+    """Decode obfuscated ID back to message ID (InvalidID on a malformed ID)"""
+    if _HEX_RE.fullmatch(encoded_id) is None:
+        raise InvalidID(encoded_id)
+    msg_id = int(encoded_id, 16) ^ SECRET_KEY
+    if not 0 < msg_id <= MAX_MSG_ID:
+        raise InvalidID(encoded_id)
+    return msg_id
+
+
+# Size units indexed by (bit_length - 1) // 10, i.e. one step per power of 1024
+_SIZE_UNITS: Final = ('B', 'KB', 'MB', 'GB', 'TB')
+_SIZE_DIV: Final = (1, 1024, 1024**2, 1024**3, 1024**4)
+
+
+def format_size(filesize: int) -> str:
+    """Human readable file size without a compare ladder"""
+    i = min(len(_SIZE_UNITS) - 1, (filesize.bit_length() - 1) // 10) if filesize else 0
+    return f"{filesize / _SIZE_DIV[i]:.2f} {_SIZE_UNITS[i]}"
+
+
+# Single "bytes=start-end" spec; either side may be empty ("bytes=500-", "bytes=-500")
+_RANGE_RE: Final = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+# Players repeat the same few headers ("bytes=0-", resume points) for the same file
+@lru_cache(maxsize=1024)
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int, bool]]:
+    """Inclusive (start, end, partial) of a Range header within size, or None if
+    unsatisfiable (416). Headers we can't or won't serve (malformed, multi-range,
+    inverted) come back as the whole file with partial=False, i.e. a plain 200."""
+    whole = (0, size - 1, False)
+    m = _RANGE_RE.fullmatch(range_header.strip())
+    if m is None or size == 0:
+        return whole
+    s, e = m.groups()
+    if s:
+        start = int(s)
+        if e and int(e) < start:
+            return whole
+        if start >= size:
+            return None
+        end = min(int(e), size - 1) if e else size - 1
+    elif e:
+        # Suffix range: the last N bytes ("bytes=-0" selects nothing)
+        if int(e) == 0:
+            return None
+        start = max(size - int(e), 0)
+        end = size - 1
+    else:
+        return whole
+    return start, end, True
+
+
+# Characters that can't sit inside a quoted latin-1 header value
+_UNSAFE_FILENAME_RE: Final = re.compile(r'[^\x20-\x7e]|["\\]')
+
+
+@lru_cache(maxsize=4096)
+def content_disposition(filename: str) -> str:
+    """attachment header with an ASCII fallback name plus the exact UTF-8 one (RFC 6266/5987)"""
+    fallback = _UNSAFE_FILENAME_RE.sub("_", filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
@@ -4,27 +4,32 @@ File path: api/index.py -> becomes /api endpoint
 """
 
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
+import orjson
 
 app = FastAPI(title="StreamGobhar API", version="1.0.0")
 
+# Both bodies are constant: serialize them once at import
+ROOT_JSON = orjson.dumps({
+    "status": "ok",
+    "message": "StreamGobhar API - Telegram File Streaming Service",
+    "version": "1.0.0",
+    "endpoints": {
+        "webhook": "/api/webhook",
+        "stream": "/api/stream/{msg_id}",
+        "download": "/api/download/{msg_id}"
+    }
+})
+HEALTH_JSON = orjson.dumps({"status": "healthy"})
+
 
 @app.get("/")
 async def root():
     """API root endpoint - shows available endpoints"""
-    return JSONResponse({
-        "status": "ok",
-        "message": "StreamGobhar API - Telegram File Streaming Service",
-        "version": "1.0.0",
-        "endpoints": {
-            "webhook": "/api/webhook",
-            "stream": "/api/stream/{msg_id}",
-            "download": "/api/download/{msg_id}"
-        }
-    })
+    return Response(ROOT_JSON, media_type="application/json", headers={"Cache-Control": "public, max-age=60"})
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    return JSONResponse({"status": "healthy"})
+    return Response(HEALTH_JSON, media_type="application/json")
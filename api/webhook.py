@@ -3,57 +3,121 @@ Telegram Bot Webhook Handler - FastAPI serverless function
 File path: api/webhook.py -> becomes /api/webhook endpoint
 """
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, BackgroundTasks
+from fastapi.responses import Response
 from telethon import TelegramClient
 from telethon.tl.types import DocumentAttributeVideo
 from telethon.sessions import StringSession
+from contextlib import asynccontextmanager
+import asyncio
+import orjson
 import os
 import sys
+import logging
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from config import API_ID, API_HASH, BOT_TOKEN, BIN_CHANNEL
 
-app = FastAPI()
+log = logging.getLogger(__name__)
+
+# Set once bot.start() has logged in; until then every update retries it
+BOT_AUTHORIZED = False
+BOT_LOCK = asyncio.Lock()
+
+
+async def ensure_bot(bot):
+    """Log the bot in if startup couldn't, or reconnect it if its socket dropped"""
+    global BOT_AUTHORIZED
+    if not BOT_AUTHORIZED:
+        async with BOT_LOCK:
+            if not BOT_AUTHORIZED:
+                await bot.start(bot_token=BOT_TOKEN)
+                BOT_AUTHORIZED = True
+    # The bot session stays in memory, so a dropped socket only needs reconnecting
+    elif not bot.is_connected():
+        await bot.connect()
+    return bot
+
+
+# Storage channel as an InputPeerChannel, so send_file skips the entity lookup
+BIN_PEER = None
+
+
+async def get_bin_peer(bot):
+    """BIN_CHANNEL resolved once per instance (bots may fetch channels by bare id)"""
+    global BIN_PEER
+    if BIN_PEER is None:
+        BIN_PEER = await bot.get_input_entity(BIN_CHANNEL)
+    return BIN_PEER
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Log the bot in once per instance; every update reuses the connected client"""
+    app.state.bot = None
+    if API_ID and API_HASH and BOT_TOKEN:
+        app.state.bot = TelegramClient(StringSession(), API_ID, API_HASH)
+        # A FloodWait or network error must not stop the function from booting:
+        # the first update logs in instead
+        try:
+            await ensure_bot(app.state.bot)
+        except Exception as e:
+            log.warning("⚠️ Bot start failed: %s", e)
+    yield
+    if app.state.bot is not None:
+        await app.state.bot.disconnect()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Constant bodies: serialize them once at import
+OK_JSON = orjson.dumps({"ok": True})
+INFO_JSON = orjson.dumps({"status": "ok", "message": "Webhook endpoint active"})
+NO_BOT_JSON = orjson.dumps({
+    "error": "Configuration Error",
+    "details": "API_ID, API_HASH or BOT_TOKEN not set in environment variables"
+})
 
 
 @app.post("/")
-async def webhook(request: Request):
+async def webhook(request: Request, background_tasks: BackgroundTasks):
     """Handle Telegram webhook updates"""
+    bot = request.app.state.bot
+    if bot is None:
+        return Response(NO_BOT_JSON, status_code=500, media_type="application/json")
     try:
-        update_data = await request.json()
-        await process_update(update_data, request)
-        return JSONResponse({"ok": True})
+        update_data = orjson.loads(await request.body())
+        # Edits, channel posts, callbacks...: nothing to do, answer before queueing work
+        if 'message' not in update_data:
+            return Response(OK_JSON, media_type="application/json")
+        # Uploads run after Telegram has its 200, so they never hold up the webhook
+        background_tasks.add_task(process_update, update_data, bot, get_base_url(request))
+        return Response(OK_JSON, media_type="application/json")
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return Response(orjson.dumps({"error": str(e)}), status_code=500, media_type="application/json")
 
 
 @app.get("/")
 async def webhook_info():
     """Health check"""
-    return JSONResponse({"status": "ok", "message": "Webhook endpoint active"})
+    return Response(INFO_JSON, media_type="application/json")
 
 
-async def process_update(update_data: dict, request: Request):
-    """Process Telegram bot update"""
-    
-    # Get base URL from Vercel environment or request headers
+def get_base_url(request: Request):
+    """Base URL from Vercel environment or request headers"""
     vercel_url = os.getenv("VERCEL_URL", "")
     if vercel_url:
-        base_url = f"https://{vercel_url}"
-    else:
-        host = request.headers.get("host", "localhost:9090")
-        protocol = request.headers.get("x-forwarded-proto", "http")
-        base_url = f"{protocol}://{host}"
-    
-    # Initialize bot
-    bot = TelegramClient(StringSession(), API_ID, API_HASH)
-    await bot.start(bot_token=BOT_TOKEN)
+        return f"https://{vercel_url}"
+    host = request.headers.get("host", "localhost:9090")
+    protocol = request.headers.get("x-forwarded-proto", "http")
+    return f"{protocol}://{host}"
+
+
+async def process_update(update_data: dict, bot: TelegramClient, base_url: str):
+    """Process Telegram bot update with the shared bot client"""
     
     try:
-        if 'message' not in update_data:
-            return
-            
+        await ensure_bot(bot)
         message = update_data['message']
         chat_id = message['chat']['id']
         
@@ -72,8 +136,20 @@ async def process_update(update_data: dict, request: Request):
             msg = await bot.get_messages(chat_id, ids=msg_id)
             
             if msg and msg.file:
+                # Tell the user while the upload runs; the reply is edited into the links
+                progress_task = asyncio.create_task(bot.send_message(chat_id, "📤 Uploading…"))
+                
                 # Upload to storage channel
-                uploaded_msg = await bot.send_file(BIN_CHANNEL, msg.media)
+                try:
+                    uploaded_msg = await bot.send_file(await get_bin_peer(bot), msg.media)
+                except Exception:
+                    # Don't leave "Uploading…" in the chat; the notice may itself have failed
+                    try:
+                        progress_msg = await progress_task
+                        await bot.edit_message(chat_id, progress_msg.id, "❌ Upload failed")
+                    except Exception as e:
+                        log.warning("upload failure notice failed: %r", e)
+                    raise
                 
                 # Generate links
                 download_link = f"{base_url}/api/download/{uploaded_msg.id}"
@@ -86,20 +162,28 @@ async def process_update(update_data: dict, request: Request):
                 
                 if is_video:
                     stream_link = f"{base_url}/api/stream/{uploaded_msg.id}"
-                    await bot.send_message(
-                        chat_id,
+                    response = (
                         f"✅ File uploaded!\n\n"
                         f"🔗 Download: {download_link}\n"
                         f"▶️ Stream: {stream_link}"
                     )
                 else:
-                    await bot.send_message(
-                        chat_id,
+                    response = (
                         f"✅ File uploaded!\n\n"
                         f"🔗 Download: {download_link}"
                     )
+                
+                # A failed notice (flood wait, blocked chat...) must not cost the user the links
+                try:
+                    progress_msg = await progress_task
+                except Exception as e:
+                    log.warning("upload notice failed: %r", e)
+                    await bot.send_message(chat_id, response)
+                else:
+                    await bot.edit_message(chat_id, progress_msg.id, response)
             else:
                 await bot.send_message(chat_id, "❌ Please send a valid file.")
     
-    finally:
-        await bot.disconnect()
+    except Exception:
+        # The response is already sent: the function logs are the only place this shows up
+        log.exception("update processing failed")
@@ -4,18 +4,20 @@ Configuration loader - loads all settings from environment variables
 import os
 from dotenv import load_dotenv
 
+from _utils import safe_int
+
 load_dotenv()
 
-# Telegram credentials
-API_ID = int(os.getenv("API_ID", "0"))
-API_HASH = os.getenv("API_HASH", "")
-BOT_TOKEN = os.getenv("BOT_TOKEN", "")
+# Telegram credentials (parsed like index.py, which shares _tg_stream with the api functions)
+API_ID = safe_int(os.getenv("API_ID"))
+API_HASH = os.getenv("API_HASH", "").strip()
+BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
 
 # Storage channel
-BIN_CHANNEL = int(os.getenv("BIN_CHANNEL", "0"))
+BIN_CHANNEL = safe_int(os.getenv("BIN_CHANNEL"))
 
 # Session string for persistent auth
-SESSION_STRING = os.getenv("SESSION_STRING", "")
+SESSION_STRING = os.getenv("SESSION_STRING", "").strip()
 
 # Phone number (for session generation)
 PHONE_NUMBER = os.getenv("PHONE_NUMBER", "")
@@ -3,45 +3,132 @@ StreamGobhar - Telegram File Streaming Service
 Optimized for Vercel Serverless & Robust Bot Support
 """
 
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, BackgroundTasks
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, JSONResponse, HTMLResponse, RedirectResponse
 from telethon import TelegramClient
-from telethon.sessions import StringSession
-from telethon.tl.types import DocumentAttributeVideo
+from telethon.errors import RPCError
+from telethon.tl.types import DocumentAttributeVideo, DocumentAttributeFilename
+from telethon.utils import get_input_location
+from telethon.client.downloads import MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+import telethon as _telethon
 import os
+import sys
+import atexit
+import asyncio
+import logging
+import logging.handlers
+import queue
+import hashlib
+import html
+import re
+import string
+import struct
 import traceback
 import httpx
 import mimetypes
+import orjson
+from functools import lru_cache
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+# C event loop for the whole process (uvicorn also picks up httptools when installed)
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+# Request handlers only enqueue log records; a background thread does the
+# formatting and the (blocking) writes to Vercel's log pipe. Production runs at
+# WARNING, so the per-request INFO lines cost a single level check.
+_LOG_LEVEL_ENV = os.getenv("LOG_LEVEL", "WARNING").upper()
+# basicConfig raises on an unknown name, which would fail every route at import
+LOG_LEVEL = _LOG_LEVEL_ENV if _LOG_LEVEL_ENV in logging.getLevelNamesMapping() else "WARNING"
+# DEBUG=1 adds tracebacks to 500 bodies; otherwise they only go to the logs
+DEBUG = os.getenv("DEBUG") == "1"
+_LOG_QUEUE = queue.SimpleQueue()
+logging.basicConfig(level=LOG_LEVEL, format="%(message)s", handlers=[logging.handlers.QueueHandler(_LOG_QUEUE)])
+log = logging.getLogger("tfs")
+_LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, logging.StreamHandler(sys.stdout))
+_LOG_LISTENER.start()
+atexit.register(_LOG_LISTENER.stop)
+if LOG_LEVEL != _LOG_LEVEL_ENV:
+    log.warning("⚠️ Unknown LOG_LEVEL %r, using WARNING", _LOG_LEVEL_ENV)
+
 # ============================================================================
 # UTILS & WRAPPERS
 # ============================================================================
 
-class TelegramStreamWrapper:
-    """Helper to stream Telegram chunks to FastAPI response"""
-    def __init__(self, client, iterator):
-        self.client = client
-        self.iterator = iterator
-    async def __aiter__(self):
-        try:
-            async for chunk in self.iterator:
-                yield chunk
-        except Exception as e:
-            print(f"📡 Stream Interrupted: {e}")
-        finally:
-            # We don't disconnect here because we use a GLOBAL_CLIENT pool
-            pass
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson instead of the stdlib encoder"""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+class PageGZipMiddleware(GZipMiddleware):
+    """GZip for HTML/JSON only; Telegram byte streams (and their ranges) pass through untouched"""
+    RAW_PATH_PREFIXES = ("/stream/", "/download/")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.RAW_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Telethon caps upload.getFile at 512 KiB per call and clamps larger request sizes,
+# so LARGE_CHUNK tracks its limit. Documents have no plain HTTP CDN URL:
+# FileMigrate / FileCdnRedirect answers are followed by Telethon itself over its
+# cached per-DC senders, so chunks already ride persistent connections.
+SMALL_CHUNK = 128 * 1024
+LARGE_CHUNK = MAX_CHUNK_SIZE
+LARGE_BODY = 8 * 1024 * 1024
+# Whole-file downloads care about throughput, not first-byte latency: read further
+# ahead and hand the server bigger writes (fewer send() calls per GB)
+DOWNLOAD_PREFETCH_DEPTH = 8
+DOWNLOAD_COALESCE_LIMIT = 4 * 1024 * 1024
+
+PROBE_CHUNK = MIN_CHUNK_SIZE  # smallest getFile request; covers players' bytes=0-1 probes
+
+def pick_chunk_size(length: int) -> int:
+    """Big bodies use full-size requests (fewer round-trips); short ranges stay snappy"""
+    if length <= PROBE_CHUNK:
+        return PROBE_CHUNK
+    return LARGE_CHUNK if length > LARGE_BODY else SMALL_CHUNK
+
+
+# Load the system MIME tables now instead of lazily inside the first request
+mimetypes.init()
+
+# Anything video-like is served as video/mp4 so browsers hand it to the player
+_VIDEO_EXT_RE = re.compile(r"\.(mp4|m4v|mkv|mov|avi|webm)$", re.I)
+
+def is_video(mime: str, filename: str) -> bool:
+    return mime.startswith("video/") or _VIDEO_EXT_RE.search(filename) is not None
+
+@lru_cache(maxsize=4096)
+def guess_mime(filename: str) -> str:
+    """mimetypes.guess_type memoized per filename ('' when unknown)"""
+    mime, _ = mimetypes.guess_type(filename)
+    return mime or ''
+
+
+def doc_filename(document, default="file"):
+    """First non-empty file name among the document attributes"""
+    return next((a.file_name for a in document.attributes
+                 if isinstance(a, DocumentAttributeFilename) and a.file_name), default)
+
 
 load_dotenv()
 
-# Helper for safe int conversion
-def safe_int(val, default=0):
-    try:
-        if not val: return default
-        return int(str(val).strip())
-    except:
-        return default
+# Pure per-request helpers live in _utils so they can be compiled with mypyc
+from _utils import safe_int, get_now, encode_id, decode_id, format_size, parse_range, InvalidID, content_disposition
+# MTProto clients, transfer pool and streaming wrapper, shared with the api functions
+from _tg_stream import (
+    PREROLL_SIZE, _PREROLL_CACHE, copy_session, get_client, acquire_stream_client,
+    release_stream_client, get_bin_peer, disconnect_clients, json_body, TelegramStreamWrapper, TelegramStreamingResponse,
+)
 
 # Configuration
 API_ID = safe_int(os.getenv("API_ID"))
@@ -49,7 +136,6 @@ API_HASH = os.getenv("API_HASH", "").strip()
 BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
 BIN_CHANNEL = safe_int(os.getenv("BIN_CHANNEL"))
 SESSION_STRING = os.getenv("SESSION_STRING", "").strip()
-SECRET_KEY = safe_int(os.getenv("SECRET_KEY"), 742658931)
 
 # Auto-detect base URL (Manual env takes priority)
 MANUAL_BASE_URL = os.getenv("BASE_URL", "").strip()
@@ -65,69 +151,192 @@ else:
 
 if BASE_URL.endswith('/'): BASE_URL = BASE_URL[:-1]
 
-app = FastAPI(title="StreamGobhar API", version="3.0.0")
+# Link prefixes are fixed per deploy, so build them once
+STREAM_PREFIX = f"{BASE_URL}/stream/"
+DOWNLOAD_PREFIX = f"{BASE_URL}/download/"
+VIEW_PREFIX = f"{BASE_URL}/v/"
+FILE_PREFIX = f"{BASE_URL}/f/"
+
+# One pooled HTTP/2 client for every Bot API call: warm invocations skip DNS + TLS
+TG_HTTP = httpx.AsyncClient(
+    base_url=f"https://api.telegram.org/bot{BOT_TOKEN}/",
+    http2=True,
+    timeout=10,
+    limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+)
+# Bodies are pre-encoded with orjson, so the header has to be set by hand
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Do the MTProto handshake (and the storage channel lookup) at cold start instead
+    # of inside the first /stream hit
+    async def warm_up():
+        await get_bin_peer(await get_client())
+    if API_ID and API_HASH:
+        try:
+            await asyncio.wait_for(warm_up(), timeout=10)
+        except asyncio.TimeoutError:
+            log.warning("⚠️ MTProto warm-up timed out; connecting on first request")
+        except Exception as e:
+            log.warning("⚠️ Storage channel lookup failed: %s", e)
+    yield
+    await disconnect_clients()
+    await TG_HTTP.aclose()
+
+app = FastAPI(title="StreamGobhar API", version="3.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
+app.add_middleware(PageGZipMiddleware, minimum_size=500, compresslevel=6)
 
 # Global for simple diagnostics
 LAST_LOG = "No events yet"
 FLOOD_WAIT_UNTIL = 0  # Timestamp when we can try again
+_FLOOD_RE = re.compile(r'wait of (\d+)')
 # Removed STARTUP_TIME - It causes issues on Vercel cold starts
 
-def get_now():
-    import time
-    return int(time.time())
-
-# Global Client for Reuse (Helps with Vercel warm starts)
-GLOBAL_CLIENT = None
+# Players fire dozens of range requests per video; resolve each file only once
+META_TTL = 600  # seconds; well inside the lifetime of a document's file_reference
+META_CACHE_SIZE = 4096
+_META_CACHE = {}  # encoded_id -> (expires_at, (dc_id, location, filename, mime, size))
 
-async def get_client():
-    global GLOBAL_CLIENT
-    if GLOBAL_CLIENT is None or not GLOBAL_CLIENT.is_connected():
-        try:
-            GLOBAL_CLIENT = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH)
-            await GLOBAL_CLIENT.connect()
-        except Exception as e:
-            print(f"⚠️ Initial Connect Failed: {e}")
-    return GLOBAL_CLIENT
+async def resolve(encoded_id):
+    """(dc_id, location, filename, mime, size) for an encoded id, or None if it isn't a document"""
+    now = get_now()
+    hit = _META_CACHE.get(encoded_id)
+    if hit and hit[0] > now:
+        return hit[1]
+    # A malformed id is just "not found": no need to touch Telegram for it
+    try:
+        msg_id = decode_id(encoded_id)
+    except InvalidID:
+        return None
+    client = await get_client()
+    msg = await client.get_messages(await get_bin_peer(client), ids=msg_id)
+    if not msg or not msg.document:
+        return None
+    doc = msg.document
+    filename = doc_filename(doc)
+    # Keep the ready-made InputDocumentFileLocation, not the Document: iter_download
+    # takes it (with dc_id and file_size) as is
+    dc_id, location = get_input_location(doc)
+    meta = (dc_id, location, filename, guess_mime(filename) or doc.mime_type or "application/octet-stream", doc.size)
+    if len(_META_CACHE) >= META_CACHE_SIZE:
+        # Dicts keep insertion order: drop the oldest entry
+        del _META_CACHE[next(iter(_META_CACHE))]
+    _META_CACHE[encoded_id] = (now + META_TTL, meta)
+    return meta
 
 # Global Exception Handler for easier Vercel debugging
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    err = f"🔥 Global Exception: {str(exc)}\n{traceback.format_exc()}"
-    print(err)
-    return JSONResponse(status_code=500, content={"error": "Internal Server Error", "details": str(exc), "trace": traceback.format_exc()})
+    details = str(exc)
+    log.error("🔥 Global Exception: %s", details, exc_info=exc)
+    content = {"error": "Internal Server Error", "details": details}
+    if DEBUG:
+        # Handlers run outside the except block, so format from exc itself
+        content["trace"] = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+    return ORJSONResponse(status_code=500, content=content)
 
 
-def encode_id(msg_id: int) -> str:
-    """Encode message ID using XOR for obfuscation"""
-    obfuscated = msg_id ^ SECRET_KEY
-    return hex(obfuscated)[2:]
+# An encoded id always points at the same Telegram file, but its landing page links
+# per-deploy /assets/ names that only the current instance serves: browsers keep it
+# briefly and then revalidate against the deploy-salted ETag. The edge may hold it for
+# good, since a deploy purges Vercel's cache (it only stores responses with s-maxage).
+# (Vary: Accept-Encoding is added by the GZip middleware on compressed responses.)
+# Raw streams stay browser-cached only (too large for the edge).
+LANDING_CACHE_CONTROL = "public, max-age=300, s-maxage=31536000"
+# Content-hashed stylesheet names never change meaning
+ASSET_CACHE_CONTROL = "public, max-age=31536000, s-maxage=31536000, immutable"
+STREAM_CACHE_CONTROL = "public, max-age=86400"
+METADATA_TIMEOUT = 3.0  # seconds the /f/ page waits for file metadata
+_ETAG_SALT = os.getenv("VERCEL_GIT_COMMIT_SHA", app.version)
 
+def make_etag(*parts) -> str:
+    """Strong ETag from the values a landing page is rendered from"""
+    raw = ":".join(map(str, (_ETAG_SALT, BASE_URL) + parts)).encode()
+    return '"' + hashlib.blake2b(raw, digest_size=8).hexdigest() + '"'
 
-def decode_id(encoded_id: str) -> int:
-    """Decode obfuscated ID back to message ID"""
-    try:
-        obfuscated = int(encoded_id, 16)
-        return obfuscated ^ SECRET_KEY
-    except ValueError:
-        raise ValueError(f"Invalid ID format: {encoded_id}")
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True when the client's If-None-Match already holds this ETag"""
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    return inm.strip() == "*" or etag in (tag.strip() for tag in inm.split(","))
+
+
+# Import-time minifier for the landing templates (they stay readable in source)
+_STYLE_BLOCK_RE = re.compile(r"(<style>)(.*?)(</style>)", re.S)
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE_RE = re.compile(r"\s+")
+_CSS_PUNCT_RE = re.compile(r"\s*([{};,])\s*")
+_CSS_COLON_RE = re.compile(r":\s+")
+_CSS_LAST_SEMI_RE = re.compile(r";(?=})")
+_LINE_INDENT_RE = re.compile(r"\s*\n\s*")
+_JS_LINE_COMMENT_RE = re.compile(r"^//[^\n]*\n", re.M)
+_TAG_GAP_RE = re.compile(r">\s+<")
+
+def _minify_css(css: str) -> str:
+    css = _CSS_COMMENT_RE.sub("", css)
+    css = _CSS_SPACE_RE.sub(" ", css)
+    css = _CSS_PUNCT_RE.sub(r"\1", css)
+    css = _CSS_COLON_RE.sub(":", css)
+    return _CSS_LAST_SEMI_RE.sub("", css).strip()
+
+
+def minify_html(source: str) -> str:
+    """Collapse template whitespace; keeps line breaks in scripts so JS semantics are untouched"""
+    source = _STYLE_BLOCK_RE.sub(lambda m: m.group(1) + _minify_css(m.group(2)) + m.group(3), source)
+    source = _LINE_INDENT_RE.sub("\n", source)
+    # Whole-line // comments only: after indent collapsing they start at column 0
+    source = _JS_LINE_COMMENT_RE.sub("", source)
+    return _TAG_GAP_RE.sub("><", source).strip()
+
+
+# Landing stylesheets, served from /assets/ under content-hashed names
+STATIC_ASSETS = {}
+
+def externalize_css(name: str, source: str) -> str:
+    """Move a template's first <style> block into a cacheable /assets/ stylesheet"""
+    m = _STYLE_BLOCK_RE.search(source)
+    css = _minify_css(m.group(2)).replace("{{", "{").replace("}}", "}").encode()
+    filename = f"{name}.{hashlib.blake2b(css, digest_size=6).hexdigest()}.css"
+    STATIC_ASSETS[filename] = css
+    return source[:m.start()] + f'<link rel="stylesheet" href="/assets/{filename}">' + source[m.end():]
+
+
+def compile_template(source: str):
+    """Compile a str.format template ahead of time into a plain Python function:
+    literals become pre-encoded UTF-8 constants and each field one escaped argument,
+    so rendering is a single bytes join with no parsing, lookups or page re-encoding."""
+    namespace = {"_escape": html.escape}
+    fields, pieces = [], []
+    for i, (literal, field, _, _) in enumerate(string.Formatter().parse(source)):
+        if literal:
+            namespace[f"_lit{i}"] = literal.encode()
+            pieces.append(f"_lit{i}")
+        if field is not None:
+            if field not in fields:
+                fields.append(field)
+            pieces.append(f"_escape(str({field})).encode()")
+    code = f"def render(*, {', '.join(fields)}):\n    return b''.join(({', '.join(pieces)},))\n"
+    exec(compile(code, "<template>", "exec"), namespace)
+    return namespace["render"]
 
 
 async def send_text_fast(chat_id, text):
     """Instant reply using Bot API (No connection delays)"""
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        async with httpx.AsyncClient() as client:
-            r = await client.post(url, json={
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": "HTML"
-            }, timeout=10)
-            res = r.json()
-            if not res.get("ok"):
-                print(f"❌ Bot API Response Error: {res}")
-            return res.get("ok")
+        r = await TG_HTTP.post("sendMessage", content=orjson.dumps({
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "HTML"
+        }), headers=JSON_HEADERS, timeout=10)
+        res = orjson.loads(r.content)
+        if not res.get("ok"):
+            log.error("❌ Bot API Response Error: %s", res)
+        return res.get("ok")
     except Exception as e:
-        print(f"⚠️ Fast reply failed: {e}")
+        log.warning("⚠️ Fast reply failed: %s", e)
         return False
 
 
@@ -141,50 +350,86 @@ async def setup_bot():
         raise Exception(f"FloodWait Active: Please wait {wait_rem}s before trying again.")
 
     try:
-        # Use SESSION_STRING if available to avoid login loops
-        session = StringSession(SESSION_STRING) if SESSION_STRING else StringSession()
-        client = TelegramClient(session, API_ID, API_HASH)
+        # Use SESSION_STRING if available to avoid login loops (its own copy: this client
+        # runs alongside GLOBAL_CLIENT)
+        client = TelegramClient(copy_session(), API_ID, API_HASH)
         
         # start() with bot_token will only log in if the session is empty
         await client.start(bot_token=BOT_TOKEN)
         return client
     except Exception as e:
-        if "wait of" in str(e).lower():
-            import re
-            seconds = re.search(r'wait of (\d+)', str(e).lower())
+        err = str(e).lower()
+        if "wait of" in err:
+            seconds = _FLOOD_RE.search(err)
             if seconds:
                 FLOOD_WAIT_UNTIL = get_now() + int(seconds.group(1))
-        print(f"❌ MTProto Start Error: {e}")
+        log.error("❌ MTProto Start Error: %s", e)
         raise e
 
 
+# Bursts of uploads queue here instead of all hitting the channel's rate limit at once
+MAX_PARALLEL_COPIES = 8
+COPY_SLOTS = asyncio.Semaphore(MAX_PARALLEL_COPIES)
+
 async def copy_to_bin(from_chat_id, message_id):
     """Use Bot API to copy message to channel - No MTProto needed, zero latency!"""
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/copyMessage"
-        async with httpx.AsyncClient() as client:
-            r = await client.post(url, json={
+        async with COPY_SLOTS:
+            r = await TG_HTTP.post("copyMessage", content=orjson.dumps({
                 "chat_id": BIN_CHANNEL,
                 "from_chat_id": from_chat_id,
                 "message_id": message_id
-            }, timeout=15)
-            res = r.json()
-            if res.get("ok"):
-                return res["result"]["message_id"]
-            else:
-                print(f"❌ Copy API Error: {res}")
-                return None
+            }), headers=JSON_HEADERS, timeout=15)
+        res = orjson.loads(r.content)
+        if res.get("ok"):
+            return res["result"]["message_id"]
+        else:
+            log.error("❌ Copy API Error: %s", res)
+            return None
     except Exception as e:
-        print(f"⚠️ Copy failed: {e}")
+        log.warning("⚠️ Copy failed: %s", e)
         return None
 
 
+# Update fields that carry a message, and message fields that make it hostable
+MESSAGE_UPDATE_KEYS = frozenset(('message', 'channel_post', 'edited_message'))
+MEDIA_KEYS = ('document', 'video', 'audio', 'photo')
+
+# Bot replies are built once at import; only the links change per message
+WELCOME_HTML = (
+    "🚀 <b>Welcome to TeleFileStream!</b>\n\n"
+    "The most powerful file hosting and streaming bot on Telegram. Send any file or video to get instant High-Speed Stream & Download links.\n\n"
+    "💎 <b>Features:</b>\n"
+    "• <b>Instant Hosting</b>: Direct copy to cloud channel.\n"
+    "• <b>Unlimited Stream</b>: Play videos directly in player.\n"
+    "• <b>Fast Download</b>: Get direct high-speed links.\n"
+    "• <b>Zero Latency</b>: Powered by Bot-API v5.5.\n\n"
+    "📢 <b>Bot:</b> @TeleFileStream_bot\n"
+    "🌐 <b>Web:</b> <a href='https://telestream.vercel.app'>telestream.vercel.app</a>\n\n"
+    "✨ <i>Send a file to begin!</i>"
+)
+RESPONSE_TMPL = (
+    "✅ <b>Host Successful!</b>\n\n"
+    "{action}\n👉 {landing}\n\n"
+    "📁 <b>File ID:</b> <code>{encoded}</code>\n"
+    "⬇️ <b>Fast Download:</b> {download}\n\n"
+    "{tip}\n\n"
+    "⚡ <b>Made by:</b> @Sanjay_Src"
+)
+MEDIA_ACTION = "🎬 <b>WATCH YOUR VIDEO:</b>"
+MEDIA_TIP = "✨ <i>Tip: The player supports multi-audio, subtitles, and PIP!</i>"
+FILE_ACTION = "📥 <b>DOWNLOAD YOUR FILE:</b>"
+FILE_TIP = "✨ <i>Tip: High-speed cloud download available!</i>"
+
 async def handle_update_logic(message):
     """Process message logic using BOTH Bot API and MTProto fallback if needed"""
     global LAST_LOG
     try:
         # 1. Extract Info
         is_dict = isinstance(message, dict)
+        # Service messages, stickers, etc: nothing to reply to, skip all the work below
+        if is_dict and not message.get('text') and not message.get('caption') and not any(k in message for k in MEDIA_KEYS):
+            return
         chat_id = message.get('chat', {}).get('id') if is_dict else message.chat_id
         msg_id = message.get('message_id') if is_dict else message.id
         date = message.get('date') if is_dict else (message.date.timestamp() if hasattr(message.date, 'timestamp') else 0)
@@ -194,32 +439,20 @@ async def handle_update_logic(message):
         # This prevents the startup filter from breaking Vercel cold starts.
         now = get_now()
         if date < (now - 3600):
-            print(f"⏩ Ignoring very old msg {msg_id}")
+            log.info("⏩ Ignoring very old msg %s", msg_id)
             return
 
         LAST_LOG = f"Received {msg_id} from {chat_id}"
-        print(f"📩 {LAST_LOG}")
+        log.info("📩 Received %s from %s", msg_id, chat_id)
 
         # 2. Handle Commands
         cmd = text.lower().split()[0] if text else ""
         if cmd.startswith('/start'):
-            welcome = (
-                "🚀 <b>Welcome to TeleFileStream!</b>\n\n"
-                "The most powerful file hosting and streaming bot on Telegram. Send any file or video to get instant High-Speed Stream & Download links.\n\n"
-                "💎 <b>Features:</b>\n"
-                "• <b>Instant Hosting</b>: Direct copy to cloud channel.\n"
-                "• <b>Unlimited Stream</b>: Play videos directly in player.\n"
-                "• <b>Fast Download</b>: Get direct high-speed links.\n"
-                "• <b>Zero Latency</b>: Powered by Bot-API v5.5.\n\n"
-                "📢 <b>Bot:</b> @TeleFileStream_bot\n"
-                "🌐 <b>Web:</b> <a href='https://telestream.vercel.app'>telestream.vercel.app</a>\n\n"
-                "✨ <i>Send a file to begin!</i>"
-            )
-            await send_text_fast(chat_id, welcome)
+            await send_text_fast(chat_id, WELCOME_HTML)
             return
 
         # 3. Handle Media (The fast way)
-        has_media = any(k in message for k in ['document', 'video', 'audio', 'photo']) if is_dict else (message.media is not None)
+        has_media = any(k in message for k in MEDIA_KEYS) if is_dict else (message.media is not None)
         
         if has_media:
             # Step 1: Tell user we are working
@@ -234,16 +467,13 @@ async def handle_update_logic(message):
 
             # Step 3: Generate links & Meta Detection
             encoded_id = encode_id(new_msg_id)
-            download_link = f"{BASE_URL}/f/{encoded_id}"
+            download_link = FILE_PREFIX + encoded_id
             
             # Detect Content Type (Media vs File)
             filename = "file"
             if not is_dict:
                 if message.document:
-                    for attr in message.document.attributes:
-                        if hasattr(attr, "file_name") and attr.file_name:
-                            filename = attr.file_name
-                            break
+                    filename = doc_filename(message.document)
                 elif message.video:
                     filename = getattr(message.video, 'file_name', 'video.mp4')
                 elif message.audio:
@@ -262,58 +492,56 @@ async def handle_update_logic(message):
                 is_media = is_media or message.video or message.audio or message.voice
 
             if is_media:
-                landing_page = f"{BASE_URL}/v/{encoded_id}"
-                main_action = f"🎬 <b>WATCH YOUR VIDEO:</b>\n👉 {landing_page}"
-                tip = "✨ <i>Tip: The player supports multi-audio, subtitles, and PIP!</i>"
+                fields = {"action": MEDIA_ACTION, "landing": VIEW_PREFIX + encoded_id, "tip": MEDIA_TIP}
             else:
-                landing_page = f"{BASE_URL}/f/{encoded_id}"
-                main_action = f"📥 <b>DOWNLOAD YOUR FILE:</b>\n👉 {landing_page}"
-                tip = "✨ <i>Tip: High-speed cloud download available!</i>"
-
-            response = (
-                f"✅ <b>Host Successful!</b>\n\n"
-                f"{main_action}\n\n"
-                f"📁 <b>File ID:</b> <code>{encoded_id}</code>\n"
-                f"⬇️ <b>Fast Download:</b> {download_link}\n\n"
-                f"{tip}\n\n"
-                f"⚡ <b>Made by:</b> @Sanjay_Src"
-            )
-            await send_text_fast(chat_id, response)
-            print(f"🎉 Success for {chat_id}")
+                fields = {"action": FILE_ACTION, "landing": download_link, "tip": FILE_TIP}
+            fields["encoded"] = encoded_id
+            fields["download"] = download_link
+            await send_text_fast(chat_id, RESPONSE_TMPL.format_map(fields))
+            log.info("🎉 Success for %s", chat_id)
         else:
             if not text.startswith('/'):
                 await send_text_fast(chat_id, "ℹ️ Please send a <b>file</b> or <b>video</b>!")
 
     except Exception as e:
-        err = f"❌ Logic Error: {e}"
-        print(err)
-        LAST_LOG = err
-        traceback.print_exc()
+        LAST_LOG = f"❌ Logic Error: {e}"
+        log.error("❌ Logic Error: %s", e)
+        log.debug("Logic Error traceback", exc_info=True)
 
 
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
+# Fixed JSON bodies are serialized once (json_body from _tg_stream); returning a
+# Response also skips FastAPI's jsonable_encoder pass over returned dicts
+OK_JSON = orjson.dumps({"ok": True})
+LOOP_IGNORED_JSON = orjson.dumps({"ok": True, "info": "loop_ignored"})
+# Constant error bodies for the asset and file routes
+NOT_FOUND_JSON = orjson.dumps({"error": "Not found"})
+NO_SESSION_JSON = orjson.dumps({"error": "SESSION_STRING missing"})
+STREAM_NOT_FOUND_JSON = orjson.dumps({"error": "File or Document not found in channel"})
+DOWNLOAD_NOT_FOUND_JSON = orjson.dumps({"error": "File not found in channel"})
+# Everything but the last event is fixed per deploy: keep the object open for it
+_ROOT_JSON_HEAD = orjson.dumps({
+    "status": "healthy",
+    "mode": "production/serverless",
+    "bot_id": BOT_TOKEN.split(':')[0] if BOT_TOKEN else None,
+    "url": BASE_URL,
+})[:-1] + b',"last_event":'
+
 @app.get("/")
 async def root():
-    return {
-        "status": "healthy",
-        "mode": "production/serverless",
-        "bot_id": BOT_TOKEN.split(':')[0] if BOT_TOKEN else None,
-        "url": BASE_URL,
-        "last_event": LAST_LOG
-    }
+    return json_body(_ROOT_JSON_HEAD + orjson.dumps(LAST_LOG) + b"}", headers={"Cache-Control": "public, max-age=60"})
 
 @app.get("/debug")
 async def debug_info():
     """Deep diagnostics for the bot state"""
-    import telethon
     now = get_now()
     flood_status = "Inactive" if now >= FLOOD_WAIT_UNTIL else f"Active (Wait {FLOOD_WAIT_UNTIL - now}s)"
     
-    return {
-        "telethon_version": telethon.__version__,
+    return ORJSONResponse({
+        "telethon_version": _telethon.__version__,
         "flood_wait": flood_status,
         "config_check": {
             "api_id": bool(API_ID),
@@ -323,40 +551,35 @@ async def debug_info():
             "session_string_len": len(SESSION_STRING)
         },
         "url_check": {
-            "vercel_url": VERCEL_URL,
+            "vercel_url": DEPLOY_URL,
             "base_url": BASE_URL
         },
         "last_log": LAST_LOG
-    }
+    })
 
 @app.get("/set_webhook")
 async def set_webhook():
     webhook_url = f"{BASE_URL}/webhook"
-    telegram_url = f"https://api.telegram.org/bot{BOT_TOKEN}/setWebhook"
-    async with httpx.AsyncClient() as client:
-        # Added drop_pending_updates to clear the backlog
-        r = await client.post(telegram_url, data={
-            "url": webhook_url,
-            "drop_pending_updates": True
-        }, timeout=10)
-        res = r.json()
-        res["target_url_used"] = webhook_url
-        return res
+    # Added drop_pending_updates to clear the backlog
+    r = await TG_HTTP.post("setWebhook", data={
+        "url": webhook_url,
+        "drop_pending_updates": True
+    }, timeout=10)
+    res = orjson.loads(r.content)
+    res["target_url_used"] = webhook_url
+    return ORJSONResponse(res)
 
 @app.get("/delete_webhook")
 async def delete_webhook():
     """Manual endpoint to clear webhook if stuck"""
-    telegram_url = f"https://api.telegram.org/bot{BOT_TOKEN}/deleteWebhook"
-    async with httpx.AsyncClient() as client:
-        r = await client.post(telegram_url, data={"drop_pending_updates": True}, timeout=10)
-        return r.json()
+    r = await TG_HTTP.post("deleteWebhook", data={"drop_pending_updates": True}, timeout=10)
+    # Telegram's reply is already JSON: pass it through untouched
+    return json_body(r.content)
 
 @app.get("/check_webhook")
 async def check_webhook():
-    telegram_url = f"https://api.telegram.org/bot{BOT_TOKEN}/getWebhookInfo"
-    async with httpx.AsyncClient() as client:
-        r = await client.get(telegram_url, timeout=10)
-        return r.json()
+    r = await TG_HTTP.get("getWebhookInfo", timeout=10)
+    return json_body(r.content)
 
 @app.get("/test_bot")
 async def test_bot():
@@ -366,50 +589,55 @@ async def test_bot():
         me = await bot.get_me()
         await bot.send_message(BIN_CHANNEL, "🔧 **Vercel Connection Test** - Bot is Working!")
         await bot.disconnect()
-        return {"status": "success", "bot": me.username, "channel": "Message sent!"}
+        return ORJSONResponse({"status": "success", "bot": me.username, "channel": "Message sent!"})
     except Exception as e:
-        return {"status": "error", "details": str(e), "traceback": traceback.format_exc()}
+        return ORJSONResponse({"status": "error", "details": str(e), "traceback": traceback.format_exc()})
 
 @app.post("/webhook")
-async def webhook(request: Request):
+async def webhook(request: Request, background_tasks: BackgroundTasks):
     try:
         # ⚡ Webhook is now 100% MTProto-FREE! No more loops or waits.
-        update = await request.json()
+        update = orjson.loads(await request.body())
+        # Chat-member, callback, poll... updates carry no message: answer before any lookups
+        if MESSAGE_UPDATE_KEYS.isdisjoint(update):
+            return json_body(OK_JSON)
         
         msg = update.get('message') or update.get('channel_post') or update.get('edited_message')
         if not msg:
-            return {"ok": True}
+            return json_body(OK_JSON)
             
         chat_id = msg.get('chat', {}).get('id')
         
         # 1. Ignore loops
         if chat_id == BIN_CHANNEL:
-            return {"ok": True, "info": "loop_ignored"}
+            return json_body(LOOP_IGNORED_JSON)
             
-        # 2. Process logic (Will use Bot API for everything)
-        await handle_update_logic(msg)
+        # 2. Process logic (Will use Bot API for everything) after Telegram has its 200,
+        # so slow copies never trip the webhook timeout and its retries
+        background_tasks.add_task(handle_update_logic, msg)
         
-        return {"ok": True}
+        return json_body(OK_JSON)
     except Exception as e:
-        print(f"🔥 Webhook Crash: {e}")
-        return JSONResponse({"ok": True}, status_code=200) # Always 200 to stop retries
+        log.error("🔥 Webhook Crash: %s", e)
+        return json_body(OK_JSON) # Always 200 to stop retries
 
 
-@app.get("/v/{encoded_id}")
-async def video_landing_page(encoded_id: str):
-    """Premium Cinema Player for Videos"""
-    stream_url = f"{BASE_URL}/stream/{encoded_id}"
-    download_url = f"{BASE_URL}/download/{encoded_id}"
-    return HTMLResponse(content=f"""
+# Compiled once at import: only the two URLs change per request.
+# artplayer.js is preloaded from <head> but executed at the end of <body>, so it
+# downloads in parallel without blocking first paint.
+render_video_page = compile_template(minify_html(externalize_css("watch", """
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link rel="preconnect" href="https://cdn.jsdelivr.net">
+    <link rel="preload" as="script" href="https://cdn.jsdelivr.net/npm/artplayer/dist/artplayer.js">
     <title>🎬 TeleFileStream Cinema</title>
     <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>🎬</text></svg>">
     <link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap">
-    <script src="https://cdn.jsdelivr.net/npm/artplayer/dist/artplayer.js"></script>
     <style>
         * {{ margin: 0; padding: 0; box-sizing: border-box; }}
         :root {{
@@ -534,6 +762,13 @@ async def video_landing_page(encoded_id: str):
             width: 100%;
             aspect-ratio: 16/9;
         }}
+        .player-wrapper.portrait {{
+            max-width: 400px;
+            margin: 0 auto;
+        }}
+        .portrait .player-container {{
+            aspect-ratio: 9/16;
+        }}
         #artplayer-app {{
             position: absolute;
             inset: 0;
@@ -541,6 +776,26 @@ async def video_landing_page(encoded_id: str):
             height: 100%;
         }}
         
+        /* Loading Spinner (Artplayer icon) */
+        .spinner-box {{
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            width: 100%;
+            height: 100%;
+        }}
+        .spinner {{
+            width: 50px;
+            height: 50px;
+            border: 3px solid rgba(255,255,255,0.1);
+            border-top-color: #6366f1;
+            border-radius: 50%;
+            animation: spin 1s linear infinite;
+        }}
+        @keyframes spin {{
+            to {{ transform: rotate(360deg); }}
+        }}
+        
         /* Action Bar */
         .action-bar {{
             margin-top: 32px;
@@ -691,6 +946,7 @@ async def video_landing_page(encoded_id: str):
         </footer>
     </main>
     
+    <script src="https://cdn.jsdelivr.net/npm/artplayer/dist/artplayer.js"></script>
     <script>
         var art = new Artplayer({{
             container: '#artplayer-app',
@@ -719,23 +975,16 @@ async def video_landing_page(encoded_id: str):
                 playsinline: true,
             }},
             icons: {{
-                loading: '<div style="display:flex;align-items:center;justify-content:center;width:100%;height:100%"><div style="width:50px;height:50px;border:3px solid rgba(255,255,255,0.1);border-top-color:#6366f1;border-radius:50%;animation:spin 1s linear infinite"></div></div>',
+                loading: '<div class="spinner-box"><div class="spinner"></div></div>',
                 state: '<svg width="80" height="80" viewBox="0 0 80 80"><circle cx="40" cy="40" r="38" fill="rgba(0,0,0,0.6)" stroke="rgba(255,255,255,0.2)" stroke-width="2"/><path d="M32 25 L58 40 L32 55 Z" fill="white"/></svg>'
             }}
         }});
         
-        // Custom loading spinner keyframes
-        const style = document.createElement('style');
-        style.textContent = '@keyframes spin {{ to {{ transform: rotate(360deg); }} }}';
-        document.head.appendChild(style);
-        
         art.on('ready', () => {{
             const video = art.video;
             if (video.videoHeight > video.videoWidth) {{
                 // Portrait video - adjust container
-                document.querySelector('.player-container').style.aspectRatio = '9/16';
-                document.querySelector('.player-wrapper').style.maxWidth = '400px';
-                document.querySelector('.player-wrapper').style.margin = '0 auto';
+                document.querySelector('.player-wrapper').classList.add('portrait');
             }}
         }});
         
@@ -747,159 +996,42 @@ async def video_landing_page(encoded_id: str):
     </script>
 </body>
 </html>
-""")
+""")))
 
-@app.get("/f/{encoded_id}")
-async def file_landing_page(encoded_id: str):
-    """Premium File Download Portal with Smart Type Detection"""
-    download_url = f"{BASE_URL}/download/{encoded_id}"
-    
-    # Try to get file metadata for smart icon/theming
-    file_icon = "📦"
-    file_type = "File"
-    accent_color = "#6366f1"
-    accent_glow = "rgba(99, 102, 241, 0.4)"
-    btn_gradient = "linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%)"
-    btn_text = "Download Now"
-    
-    try:
-        msg_id = decode_id(encoded_id)
-        client = await get_client()
-        msg = await client.get_messages(BIN_CHANNEL, ids=msg_id)
-        if msg and msg.document:
-            filename = "file"
-            filesize = msg.document.size
-            for attr in msg.document.attributes:
-                if hasattr(attr, "file_name") and attr.file_name:
-                    filename = attr.file_name
-                    break
-            
-            # Smart file type detection
-            ext = filename.lower().split('.')[-1] if '.' in filename else ''
-            
-            if ext == 'apk':
-                file_icon = "🤖"
-                file_type = "Android App"
-                accent_color = "#3DDC84"
-                accent_glow = "rgba(61, 220, 132, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #3DDC84 0%, #00C853 100%)"
-                btn_text = "Install APK"
-            elif ext in ('zip', 'rar', '7z', 'tar', 'gz'):
-                file_icon = "🗜️"
-                file_type = "Archive"
-                accent_color = "#f59e0b"
-                accent_glow = "rgba(245, 158, 11, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #f59e0b 0%, #d97706 100%)"
-                btn_text = "Download Archive"
-            elif ext == 'pdf':
-                file_icon = "📕"
-                file_type = "PDF Document"
-                accent_color = "#ef4444"
-                accent_glow = "rgba(239, 68, 68, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #ef4444 0%, #dc2626 100%)"
-                btn_text = "Download PDF"
-            elif ext in ('doc', 'docx'):
-                file_icon = "📝"
-                file_type = "Word Document"
-                accent_color = "#2563eb"
-                accent_glow = "rgba(37, 99, 235, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #2563eb 0%, #1d4ed8 100%)"
-                btn_text = "Download Document"
-            elif ext in ('xls', 'xlsx', 'csv'):
-                file_icon = "📊"
-                file_type = "Spreadsheet"
-                accent_color = "#22c55e"
-                accent_glow = "rgba(34, 197, 94, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #22c55e 0%, #16a34a 100%)"
-                btn_text = "Download Spreadsheet"
-            elif ext in ('ppt', 'pptx'):
-                file_icon = "📽️"
-                file_type = "Presentation"
-                accent_color = "#f97316"
-                accent_glow = "rgba(249, 115, 22, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #f97316 0%, #ea580c 100%)"
-                btn_text = "Download Presentation"
-            elif ext in ('exe', 'msi'):
-                file_icon = "💿"
-                file_type = "Windows App"
-                accent_color = "#0ea5e9"
-                accent_glow = "rgba(14, 165, 233, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #0ea5e9 0%, #0284c7 100%)"
-                btn_text = "Download Installer"
-            elif ext in ('dmg', 'pkg'):
-                file_icon = "🍎"
-                file_type = "Mac App"
-                accent_color = "#a855f7"
-                accent_glow = "rgba(168, 85, 247, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #a855f7 0%, #9333ea 100%)"
-                btn_text = "Download for Mac"
-            elif ext in ('iso', 'img'):
-                file_icon = "💽"
-                file_type = "Disk Image"
-                accent_color = "#64748b"
-                accent_glow = "rgba(100, 116, 139, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #64748b 0%, #475569 100%)"
-                btn_text = "Download Image"
-            elif ext in ('ttf', 'otf', 'woff', 'woff2'):
-                file_icon = "🔤"
-                file_type = "Font File"
-                accent_color = "#ec4899"
-                accent_glow = "rgba(236, 72, 153, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #ec4899 0%, #db2777 100%)"
-                btn_text = "Download Font"
-            elif ext in ('jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp'):
-                file_icon = "🖼️"
-                file_type = "Image"
-                accent_color = "#14b8a6"
-                accent_glow = "rgba(20, 184, 166, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #14b8a6 0%, #0d9488 100%)"
-                btn_text = "Download Image"
-            elif ext == 'json':
-                file_icon = "📋"
-                file_type = "JSON Data"
-                accent_color = "#84cc16"
-                accent_glow = "rgba(132, 204, 22, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #84cc16 0%, #65a30d 100%)"
-                btn_text = "Download JSON"
-            elif ext in ('txt', 'log', 'md'):
-                file_icon = "📄"
-                file_type = "Text File"
-                accent_color = "#6b7280"
-                accent_glow = "rgba(107, 114, 128, 0.4)"
-                btn_gradient = "linear-gradient(135deg, #6b7280 0%, #4b5563 100%)"
-                btn_text = "Download Text"
-            else:
-                file_icon = "📦"
-                file_type = f".{ext.upper()} File" if ext else "File"
-            
-            # Format file size
-            if filesize < 1024:
-                size_str = f"{filesize} B"
-            elif filesize < 1024*1024:
-                size_str = f"{filesize/1024:.1f} KB"
-            elif filesize < 1024*1024*1024:
-                size_str = f"{filesize/(1024*1024):.1f} MB"
-            else:
-                size_str = f"{filesize/(1024*1024*1024):.2f} GB"
-    except:
-        filename = "file"
-        size_str = "Unknown"
-        pass
-    
-    return HTMLResponse(content=f"""
+@app.get("/assets/{name}")
+async def static_asset(name: str):
+    """Landing stylesheets; the name changes with the content, so cache them forever"""
+    css = STATIC_ASSETS.get(name)
+    if css is None:
+        return json_body(NOT_FOUND_JSON, status_code=404)
+    return Response(content=css, media_type="text/css", headers={"Cache-Control": ASSET_CACHE_CONTROL})
+
+@app.get("/v/{encoded_id}")
+async def video_landing_page(encoded_id: str, request: Request):
+    """Premium Cinema Player for Videos"""
+    etag = make_etag(encoded_id)
+    cache_headers = {"Cache-Control": LANDING_CACHE_CONTROL, "ETag": etag}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    stream_url = STREAM_PREFIX + encoded_id
+    download_url = DOWNLOAD_PREFIX + encoded_id
+    return HTMLResponse(content=render_video_page(stream_url=stream_url, download_url=download_url), headers=cache_headers)
+
+render_file_page = compile_template(minify_html(externalize_css("file", """
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
     <title>🚀 {file_type} Download | TeleFileStream</title>
     <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>📦</text></svg>">
     <link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap">
     <style>
         * {{ margin: 0; padding: 0; box-sizing: border-box; }}
         :root {{
-            --primary: {accent_color};
-            --primary-glow: {accent_glow};
             --accent: #22d3ee;
             --bg-dark: #0a0a0f;
             --bg-card: rgba(255, 255, 255, 0.03);
@@ -941,27 +1073,26 @@ async def file_landing_page(encoded_id: str):
             100% {{ transform: translate(-5%, -5%) scale(1.1); opacity: 1; }}
         }}
         
-        /* Floating Particles */
+        /* Floating Particles: one tiled gradient layer drifting up (compositor-only transform) */
         .particles {{
             position: fixed;
-            inset: 0;
+            top: 0;
+            left: 0;
+            right: 0;
+            height: 200vh;
             z-index: -1;
-            overflow: hidden;
-        }}
-        .particle {{
-            position: absolute;
-            width: 4px;
-            height: 4px;
-            background: var(--primary);
-            border-radius: 50%;
+            pointer-events: none;
             opacity: 0.3;
+            background-image:
+                radial-gradient(circle, var(--primary) 2px, transparent 2.5px),
+                radial-gradient(circle, var(--primary) 2px, transparent 2.5px);
+            background-size: 10% 50vh;
+            background-position: 0 0, 5% 25vh;
             animation: float 20s infinite linear;
         }}
         @keyframes float {{
-            0% {{ transform: translateY(100vh) rotate(0deg); opacity: 0; }}
-            10% {{ opacity: 0.3; }}
-            90% {{ opacity: 0.3; }}
-            100% {{ transform: translateY(-100vh) rotate(720deg); opacity: 0; }}
+            0% {{ transform: translateY(0); }}
+            100% {{ transform: translateY(-100vh); }}
         }}
         
         /* Premium Header */
@@ -1111,8 +1242,7 @@ async def file_landing_page(encoded_id: str):
             align-items: center;
             gap: 8px;
             padding: 8px 20px;
-            background: linear-gradient(135deg, var(--primary), rgba(var(--primary), 0.8));
-            background: {btn_gradient};
+            background: var(--btn-gradient);
             border-radius: 30px;
             font-size: 12px;
             font-weight: 600;
@@ -1180,7 +1310,7 @@ async def file_landing_page(encoded_id: str):
             text-decoration: none;
             cursor: pointer;
             border: none;
-            background: {btn_gradient};
+            background: var(--btn-gradient);
             color: white;
             box-shadow: 0 10px 40px var(--primary-glow);
             transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
@@ -1295,20 +1425,13 @@ async def file_landing_page(encoded_id: str):
             .features {{ gap: 8px; }}
         }}
     </style>
+    <style>
+        :root {{ --primary: {accent_color}; --primary-glow: {accent_glow}; --btn-gradient: {btn_gradient}; }}
+    </style>
 </head>
 <body>
     <div class="bg-effects"></div>
-    <div class="particles">
-        <div class="particle" style="left: 10%; animation-delay: 0s;"></div>
-        <div class="particle" style="left: 20%; animation-delay: 2s;"></div>
-        <div class="particle" style="left: 30%; animation-delay: 4s;"></div>
-        <div class="particle" style="left: 40%; animation-delay: 1s;"></div>
-        <div class="particle" style="left: 50%; animation-delay: 3s;"></div>
-        <div class="particle" style="left: 60%; animation-delay: 5s;"></div>
-        <div class="particle" style="left: 70%; animation-delay: 2.5s;"></div>
-        <div class="particle" style="left: 80%; animation-delay: 4.5s;"></div>
-        <div class="particle" style="left: 90%; animation-delay: 1.5s;"></div>
-    </div>
+    <div class="particles"></div>
     
     <header class="header">
         <a href="/" class="logo">
@@ -1364,69 +1487,167 @@ async def file_landing_page(encoded_id: str):
             </p>
         </footer>
     </main>
-    
-    <script>
-        // Add dynamic particle colors based on theme
-        document.querySelectorAll('.particle').forEach(p => {{
-            p.style.background = getComputedStyle(document.documentElement).getPropertyValue('--primary');
-        }});
-    </script>
 </body>
 </html>
-""")
+""")))
 
-@app.get("/watch/{encoded_id}")
-async def watch_player_redirect(encoded_id: str):
-    return RedirectResponse(url=f"/v/{encoded_id}")
+# Landing page theme per extension: (icon, type, accent, glow, button gradient, button text)
+_FILE_THEME_GROUPS = (
+    (("apk",),
+     ("🤖", "Android App", "#3DDC84", "rgba(61, 220, 132, 0.4)",
+      "linear-gradient(135deg, #3DDC84 0%, #00C853 100%)", "Install APK")),
+    (("zip", "rar", "7z", "tar", "gz"),
+     ("🗜️", "Archive", "#f59e0b", "rgba(245, 158, 11, 0.4)",
+      "linear-gradient(135deg, #f59e0b 0%, #d97706 100%)", "Download Archive")),
+    (("pdf",),
+     ("📕", "PDF Document", "#ef4444", "rgba(239, 68, 68, 0.4)",
+      "linear-gradient(135deg, #ef4444 0%, #dc2626 100%)", "Download PDF")),
+    (("doc", "docx"),
+     ("📝", "Word Document", "#2563eb", "rgba(37, 99, 235, 0.4)",
+      "linear-gradient(135deg, #2563eb 0%, #1d4ed8 100%)", "Download Document")),
+    (("xls", "xlsx", "csv"),
+     ("📊", "Spreadsheet", "#22c55e", "rgba(34, 197, 94, 0.4)",
+      "linear-gradient(135deg, #22c55e 0%, #16a34a 100%)", "Download Spreadsheet")),
+    (("ppt", "pptx"),
+     ("📽️", "Presentation", "#f97316", "rgba(249, 115, 22, 0.4)",
+      "linear-gradient(135deg, #f97316 0%, #ea580c 100%)", "Download Presentation")),
+    (("exe", "msi"),
+     ("💿", "Windows App", "#0ea5e9", "rgba(14, 165, 233, 0.4)",
+      "linear-gradient(135deg, #0ea5e9 0%, #0284c7 100%)", "Download Installer")),
+    (("dmg", "pkg"),
+     ("🍎", "Mac App", "#a855f7", "rgba(168, 85, 247, 0.4)",
+      "linear-gradient(135deg, #a855f7 0%, #9333ea 100%)", "Download for Mac")),
+    (("iso", "img"),
+     ("💽", "Disk Image", "#64748b", "rgba(100, 116, 139, 0.4)",
+      "linear-gradient(135deg, #64748b 0%, #475569 100%)", "Download Image")),
+    (("ttf", "otf", "woff", "woff2"),
+     ("🔤", "Font File", "#ec4899", "rgba(236, 72, 153, 0.4)",
+      "linear-gradient(135deg, #ec4899 0%, #db2777 100%)", "Download Font")),
+    (("jpg", "jpeg", "png", "gif", "webp", "svg", "bmp"),
+     ("🖼️", "Image", "#14b8a6", "rgba(20, 184, 166, 0.4)",
+      "linear-gradient(135deg, #14b8a6 0%, #0d9488 100%)", "Download Image")),
+    (("json",),
+     ("📋", "JSON Data", "#84cc16", "rgba(132, 204, 22, 0.4)",
+      "linear-gradient(135deg, #84cc16 0%, #65a30d 100%)", "Download JSON")),
+    (("txt", "log", "md"),
+     ("📄", "Text File", "#6b7280", "rgba(107, 114, 128, 0.4)",
+      "linear-gradient(135deg, #6b7280 0%, #4b5563 100%)", "Download Text")),
+)
+FILE_THEMES = {ext: theme for exts, theme in _FILE_THEME_GROUPS for ext in exts}
+DEFAULT_FILE_THEME = ("📦", "File", "#6366f1", "rgba(99, 102, 241, 0.4)",
+                      "linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%)", "Download Now")
 
-@app.get("/v_old/{encoded_id}")
-async def universal_landing_page_old(encoded_id: str):
-    return RedirectResponse(url=f"/v/{encoded_id}")
+@app.get("/f/{encoded_id}")
+async def file_landing_page(encoded_id: str, request: Request):
+    """Premium File Download Portal with Smart Type Detection"""
+    download_url = DOWNLOAD_PREFIX + encoded_id
+    
+    # Try to get file metadata for smart icon/theming
+    file_icon, file_type, accent_color, accent_glow, btn_gradient, btn_text = DEFAULT_FILE_THEME
+    filename = "file"
+    filesize = None
+    size_str = "Unknown"
+    
+    try:
+        # Render the generic page rather than hang on a slow MTProto call
+        meta = await asyncio.wait_for(resolve(encoded_id), timeout=METADATA_TIMEOUT)
+        if meta:
+            _, _, filename, mime, filesize = meta
+            # Videos sent as documents get the player page itself, not a card linking to it
+            if is_video(mime, filename):
+                return await video_landing_page(encoded_id, request)
+            
+            # Smart file type detection
+            ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+            
+            theme = FILE_THEMES.get(ext)
+            if theme:
+                file_icon, file_type, accent_color, accent_glow, btn_gradient, btn_text = theme
+            elif ext:
+                file_type = f".{ext.upper()} File"
+            
+            size_str = format_size(filesize)
+    except (asyncio.TimeoutError, RPCError, ConnectionError, ValueError, AttributeError, struct.error) as e:
+        # Bad input (an id Telethon can't serialize, etc.) still gets the fallback page.
+        # CancelledError is not caught here, so abandoned requests stop right away
+        log.warning("⚠️ Landing metadata unavailable for %s: %r", encoded_id, e)
+    
+    # Only cache pages rendered from real metadata, never the "Unknown" fallback
+    cache_headers = {}
+    if filesize is not None:
+        etag = make_etag(encoded_id, filesize, filename)
+        cache_headers = {"Cache-Control": LANDING_CACHE_CONTROL, "ETag": etag}
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers)
+    
+    page = render_file_page(
+        file_type=file_type, file_icon=file_icon, filename=filename, size_str=size_str,
+        accent_color=accent_color, accent_glow=accent_glow, btn_gradient=btn_gradient,
+        btn_text=btn_text, download_url=download_url,
+    )
+    return HTMLResponse(content=page, headers=cache_headers)
+
+async def stream_range(encoded_id, dc_id, location, size, start, end, status, headers, **wrapper_kw):
+    """Response for bytes start..end: the cached preroll first, Telegram for the rest"""
+    head = b""
+    prefix = _PREROLL_CACHE.get(encoded_id)
+    if prefix is not None and start < len(prefix):
+        _PREROLL_CACHE.move_to_end(encoded_id)
+        if end < len(prefix):
+            return Response(prefix[start:end + 1], status_code=status, headers=headers)
+        head, start = memoryview(prefix)[start:], len(prefix)
+    length = end - start + 1
+    # Fetch from a chunk-aligned offset: from an unaligned one Telethon re-downloads
+    # part of every request. iter_download's limit counts chunks, not bytes.
+    chunk = pick_chunk_size(length)
+    skip = start % chunk
+    offset = start - skip
+    # Until the wrapper exists, a failure here must hand the client back itself
+    client = await acquire_stream_client()
+    try:
+        dl_iter = client.iter_download(location, offset=offset, limit=-(-(length + skip) // chunk),
+                                       chunk_size=chunk, request_size=chunk, file_size=size, dc_id=dc_id)
+    except BaseException:
+        release_stream_client(client)
+        raise
+    # A read from byte 0 fills the preroll cache on its way through
+    capture = offset == 0 and prefix is None
+    wrapper = TelegramStreamWrapper(client, dl_iter, length, skip, head=head,
+                                    capture_key=encoded_id if capture else None,
+                                    capture_len=min(PREROLL_SIZE, size), **wrapper_kw)
+    return TelegramStreamingResponse(wrapper, status_code=status, headers=headers)
 
-@app.get("/stream/{encoded_id}")
+@app.api_route("/stream/{encoded_id}", methods=["GET", "HEAD"])
 async def stream_file(encoded_id: str, request: Request):
     """Stream any supportable file (Videos, Audios, etc)"""
     try:
-        msg_id = decode_id(encoded_id)
-        if not SESSION_STRING: return JSONResponse({"error": "SESSION_STRING missing"}, status_code=500)
+        if not SESSION_STRING: return json_body(NO_SESSION_JSON, status_code=500)
         
-        client = await get_client()
-        
-        msg = await client.get_messages(BIN_CHANNEL, ids=msg_id)
-        if not msg or not msg.document:
-            await client.disconnect()
-            return JSONResponse({"error": "File or Document not found in channel"}, status_code=404)
-        
-        # Determine filename and MIME type
-        filename = "file"
-        for attr in msg.document.attributes:
-            if hasattr(attr, "file_name") and attr.file_name:
-                filename = attr.file_name
-                break
+        range_header = request.headers.get('range', '')
+        # File bytes never change, so a revalidating full fetch needs no Telegram call at all
+        etag = make_etag("raw", encoded_id)
+        cache_headers = {"Cache-Control": STREAM_CACHE_CONTROL, "ETag": etag}
+        if not range_header and is_not_modified(request, etag):
+            return Response(status_code=304, headers=cache_headers)
         
-        # Use mimetypes to guess correctly for all extensions
-        mime, _ = mimetypes.guess_type(filename)
-        if not mime:
-            mime = msg.document.mime_type or "application/octet-stream"
+        meta = await resolve(encoded_id)
+        if not meta:
+            return json_body(STREAM_NOT_FOUND_JSON, status_code=404)
+        dc_id, location, filename, mime, size = meta
         
         # Force video/mp4 if it's likely a video for the player
-        if "video" in mime or filename.lower().endswith(('.mp4', '.mkv', '.mov', '.avi')):
+        if is_video(mime, filename):
             mime = "video/mp4"
             
-        size = msg.document.size
-        range_header = request.headers.get('range', '')
-        start, end = 0, size - 1
+        start, end, partial = 0, size - 1, False
         
         if range_header:
-            rv = range_header.replace('bytes=', '').split('-')
-            start = int(rv[0]) if rv[0] else 0
-            end = int(rv[1]) if len(rv) > 1 and rv[1] else end
-            end = min(end, size - 1)
+            rng = parse_range(range_header, size)
+            if rng is None:
+                return Response(status_code=416, headers={'Content-Range': f'bytes */{size}'})
+            start, end, partial = rng
         
         length = end - start + 1
-        # 🚀 Use a slightly smaller chunk (256KB) to avoid Vercel payload limits/timeouts
-        dl_iter = client.iter_download(msg.document, offset=start, limit=length, chunk_size=256*1024)
-        
         headers = {
             'Content-Type': mime,
             'Content-Length': str(length),
@@ -1434,56 +1655,53 @@ async def stream_file(encoded_id: str, request: Request):
             'Content-Disposition': 'inline', # FORCE INLINE FOR BROWSER PLAYBACK
             'Access-Control-Allow-Origin': '*', # Explicit CORS for the stream
             'X-Content-Type-Options': 'nosniff',
+            **cache_headers,
         }
-        if range_header:
+        if partial:
             headers['Content-Range'] = f'bytes {start}-{end}/{size}'
             status = 206
         else:
             status = 200
-            
-        print(f"📦 Streaming {filename} | Range: {start}-{end} | Type: {mime}")
-        return StreamingResponse(TelegramStreamWrapper(client, dl_iter), status_code=status, headers=headers)
+        # Players probe size and seekability with HEAD: cached metadata is enough
+        if request.method == "HEAD":
+            return Response(status_code=status, headers=headers)
+        
+        log.info("📦 Streaming %s | Range: %s-%s | Type: %s", filename, start, end, mime)
+        return await stream_range(encoded_id, dc_id, location, size, start, end, status, headers)
     except Exception as e:
-        print(f"🔥 Stream Error: {e}")
-        traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+        log.error("🔥 Stream Error: %s", e)
+        log.debug("Stream Error traceback", exc_info=True)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
-@app.get("/download/{encoded_id}")
+@app.api_route("/download/{encoded_id}", methods=["GET", "HEAD"])
 async def download_file(encoded_id: str, request: Request):
     """Download any file type (Zip, PDF, APK, etc)"""
     try:
-        msg_id = decode_id(encoded_id)
-        if not SESSION_STRING: return JSONResponse({"error": "SESSION_STRING missing"}, status_code=500)
+        if not SESSION_STRING: return json_body(NO_SESSION_JSON, status_code=500)
 
-        client = await get_client()
-        
-        msg = await client.get_messages(BIN_CHANNEL, ids=msg_id)
-        if not msg or not msg.document:
-            await client.disconnect()
-            return JSONResponse({"error": "File not found in channel"}, status_code=404)
-            
-        # Extract Filename properly
-        filename = "file"
-        for attr in msg.document.attributes:
-            if hasattr(attr, "file_name") and attr.file_name:
-                filename = attr.file_name
-                break
-        
-        # Guess MIME type for download
-        mime, _ = mimetypes.guess_type(filename)
-        if not mime:
-            mime = msg.document.mime_type or 'application/octet-stream'
-            
-        dl_iter = client.iter_download(msg.document, chunk_size=1024*1024)
+        meta = await resolve(encoded_id)
+        if not meta:
+            return json_body(DOWNLOAD_NOT_FOUND_JSON, status_code=404)
+        dc_id, location, filename, mime, size = meta
         headers = {
             'Content-Type': mime,
-            'Content-Disposition': f'attachment; filename="{filename}"',
-            'Content-Length': str(msg.document.size),
+            'Content-Disposition': content_disposition(filename),
+            'Content-Length': str(size),
         }
-        return StreamingResponse(TelegramStreamWrapper(client, dl_iter), headers=headers)
+        if request.method == "HEAD":
+            return Response(headers=headers)
+            
+        return await stream_range(encoded_id, dc_id, location, size, 0, size - 1, 200, headers,
+                                  depth=DOWNLOAD_PREFETCH_DEPTH, coalesce=DOWNLOAD_COALESCE_LIMIT)
     except Exception as e:
-        print(f"🔥 Download Error: {e}")
-        return JSONResponse({"error": str(e)}, status_code=500)
+        log.error("🔥 Download Error: %s", e)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
+
+# Legacy player links; registered last so hot routes are matched first
+@app.get("/watch/{encoded_id}")
+@app.get("/v_old/{encoded_id}")
+async def legacy_player_redirect(encoded_id: str):
+    return RedirectResponse(url=f"/v/{encoded_id}", status_code=301, headers={"Cache-Control": LANDING_CACHE_CONTROL})
 
 
 # ============================================================================